@@ -43,5 +43,12 @@ if __name__ == "__main__":
         print("Please make sure that the .env file contains OPENROUTER_API_KEY")
         exit(1)
     
+    # Use the faster libuv-based event loop when it is available
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    
     # Launch the asynchronous main function
     asyncio.run(main())
@@ -4,14 +4,15 @@
 """OpenRouter API client for accessing language models asynchronously."""
 
 import os
-import json
 import aiohttp
+import orjson
 import asyncio
-from typing import List, Dict, Any, Optional
-from dotenv import load_dotenv
+import time
+from typing import AsyncIterator, Iterable, List, Dict, Any, Optional, Tuple
 
-# Load environment variables
-load_dotenv()
+def _json_dumps(obj: Any) -> str:
+    """Serialize an object to a JSON string with orjson (aiohttp expects str)."""
+    return orjson.dumps(obj).decode()
 
 class OpenRouterClient:
     """Asynchronous client for interacting with OpenRouter API.
@@ -20,6 +21,11 @@ class OpenRouterClient:
     language models through OpenRouter's unified API.
     """
     
+    # Shared timeout settings, created once instead of per request
+    _DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=60)  # Extended timeout for response generation
+    # Long generations may exceed the total timeout, so only limit gaps between streamed chunks
+    _STREAM_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_read=60)
+    
     def __init__(self):
         """Initialize the OpenRouter client with API key and configuration."""
         self.api_key = os.getenv("OPENROUTER_API_KEY")
@@ -30,19 +36,57 @@ class OpenRouterClient:
             "HTTP-Referer": "https://telegram-bot-openrouter.example.com",
         }
         self.models_cache_file = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'models_cache.json')
+        # All requests go to a single host, so size the pool for it and
+        # keep connections and DNS results alive between requests
+        self._connector_kwargs = {
+            "limit": 32,
+            "limit_per_host": 32,
+            "ttl_dns_cache": 300,
+            "keepalive_timeout": 75,
+            "enable_cleanup_closed": True,
+        }
         self._session = None  # Session will be created when first needed
+        # Parsed models cache kept in memory: (loaded_at, models)
+        self._models_mem_cache: Optional[Tuple[float, List[Dict[str, Any]]]] = None
+        self._models_mem_ttl = 3600  # Seconds before the cache file is checked again
+        self._models_cache_stat: Optional[Tuple[float, int]] = None  # (mtime, size) of the parsed file
+        self._models_inflight: Optional[asyncio.Future] = None  # Catalog request shared by concurrent callers
+        # Free models derived from the catalog list they were computed from
+        self._free_models_source: Optional[List[Dict[str, Any]]] = None
+        self._free_models_cache: Tuple[Dict[str, Any], ...] = ()
+        self._free_models_by_id: Dict[str, Dict[str, Any]] = {}
+        self.free_models_generation = 0  # Incremented whenever the free models list is rebuilt
     
     async def _get_session(self) -> aiohttp.ClientSession:
         """Get existing HTTP session or create a new one."""
         if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession()
+            connector = aiohttp.TCPConnector(**self._connector_kwargs)
+            self._session = aiohttp.ClientSession(
+                connector=connector,  # Owned by the session, closed together with it
+                headers=self.headers,
+                timeout=self._DEFAULT_TIMEOUT,
+                json_serialize=_json_dumps  # Request bodies are serialized with orjson
+            )
         return self._session
+    
+    async def connect(self):
+        """Create the HTTP session eagerly instead of on the first request."""
+        await self._get_session()
         
     async def close(self):
         """Close the HTTP session."""
         if self._session and not self._session.closed:
             await self._session.close()
     
+    async def __aenter__(self) -> "OpenRouterClient":
+        """Open the HTTP session when entering an ``async with`` block."""
+        await self.connect()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        """Close the HTTP session when leaving an ``async with`` block."""
+        await self.close()
+    
     async def get_available_models(self, use_cache=True) -> List[Dict[str, Any]]:
         """Get list of available models from OpenRouter.
         
@@ -53,75 +97,153 @@ class OpenRouterClient:
             List of model information dictionaries
         """
         # Check if cache exists and can be used
-        if use_cache and os.path.exists(self.models_cache_file):
-            try:
-                with open(self.models_cache_file, 'r') as f:
-                    models_data = json.load(f)
-                    if models_data:
-                        return models_data
-            except Exception as e:
-                print(f"Error reading cache: {e}")
+        if use_cache:
+            if self._models_mem_cache is not None:
+                loaded_at, models_data = self._models_mem_cache
+                if time.monotonic() - loaded_at < self._models_mem_ttl:
+                    return models_data
+            
+            models_data = await self._load_models_cache()
+            if models_data:
+                return models_data
         
-        # If no cache or can't use it, fetch from API
+        # If no cache or can't use it, fetch from API.
+        # Concurrent callers share a single in-flight request.
+        if self._models_inflight is None:
+            self._models_inflight = asyncio.ensure_future(self._fetch_models())
+            self._models_inflight.add_done_callback(self._clear_models_inflight)
+        # Shield so a cancelled caller doesn't cancel the fetch for the others
+        return await asyncio.shield(self._models_inflight)
+    
+    def _clear_models_inflight(self, task: "asyncio.Future") -> None:
+        """Forget the finished models request so the next cache miss starts a new one."""
+        if self._models_inflight is task:
+            self._models_inflight = None
+    
+    async def _fetch_models(self) -> List[Dict[str, Any]]:
+        """Fetch the models catalog from the API and update the caches."""
         session = await self._get_session()
-        async with session.get(
-            f"{self.base_url}/models",
-            headers=self.headers
-        ) as response:
+        async with session.get(f"{self.base_url}/models") as response:
             if response.status != 200:
                 error_text = await response.text()
-                raise Exception(f"Error fetching models: {error_text}")
-            
-            # Get model data
-            json_data = await response.json()
-            models_data = json_data.get('data', [])
+            else:
+                error_text = None
+                # Get model data
+                json_data = orjson.loads(await response.read())
+                models_data = json_data.get('data', [])
+        
+        # Raise after the connection has been returned to the pool
+        if error_text is not None:
+            raise Exception(f"Error fetching models: {error_text}")
         
         # Save to cache
         await self._save_models_cache(models_data)
+        self._models_mem_cache = (time.monotonic(), models_data)
         
-        await response.release()
+        return models_data
+    
+    def _get_models_cache_stat(self) -> Optional[Tuple[float, int]]:
+        """Return (mtime, size) of the cache file, or None if it is missing."""
+        try:
+            stat = os.stat(self.models_cache_file)
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size
+    
+    async def _load_models_cache(self) -> Optional[List[Dict[str, Any]]]:
+        """Load models from the cache file, reusing the parsed data if the file is unchanged."""
+        cache_stat = self._get_models_cache_stat()
+        if cache_stat is None:
+            return None
+        
+        if self._models_mem_cache is not None and cache_stat == self._models_cache_stat:
+            models_data = self._models_mem_cache[1]
+        else:
+            try:
+                # Parse in a worker thread so the event loop is not blocked
+                models_data = await asyncio.to_thread(self._load_models_cache_sync)
+            except Exception as e:
+                print(f"Error reading cache: {e}")
+                return None
+            self._models_cache_stat = cache_stat
         
+        self._models_mem_cache = (time.monotonic(), models_data)
         return models_data
     
+    def _load_models_cache_sync(self) -> List[Dict[str, Any]]:
+        """Synchronous version of cache loading (runs in a worker thread)."""
+        with open(self.models_cache_file, 'rb') as f:
+            return orjson.loads(f.read())
+    
     async def _save_models_cache(self, models_data):
         """Save models data to cache file asynchronously."""
         # Create cache directory if it doesn't exist
         os.makedirs(os.path.dirname(self.models_cache_file), exist_ok=True)
         
         try:
-            # Run file saving in a separate task to avoid blocking
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None,  # use default executor
-                self._save_models_cache_sync, models_data
-            )
+            # Run file saving in a worker thread to avoid blocking
+            await asyncio.to_thread(self._save_models_cache_sync, models_data)
+            self._models_cache_stat = self._get_models_cache_stat()
         except Exception as e:
             print(f"Error saving cache: {e}")
     
     def _save_models_cache_sync(self, models_data):
-        """Synchronous version of cache saving (runs in executor)."""
-        with open(self.models_cache_file, 'w') as f:
-            json.dump(models_data, f, indent=2)
+        """Synchronous version of cache saving (runs in a worker thread)."""
+        with open(self.models_cache_file, 'wb') as f:
+            f.write(orjson.dumps(models_data))
     
-    async def get_free_models(self, limit=None) -> List[Dict[str, Any]]:
+    async def get_free_models(self, limit=None) -> Tuple[Dict[str, Any], ...]:
         """Get only truly free models from OpenRouter.
         
+        The returned tuple is shared between calls until the catalog is reloaded,
+        which is signalled by a change of free_models_generation.
+        
         Args:
             limit: Maximum number of models to return, None for all models
             
         Returns:
-            List of completely free model information dictionaries, sorted by preference
+            Tuple of completely free model information dictionaries, sorted by preference
         """
-        models_data = await self.get_available_models()
+        # Page clicks in the bot call this repeatedly, so serve a fresh list directly from memory
+        mem_cache = self._models_mem_cache
+        if (mem_cache is None or mem_cache[1] is not self._free_models_source
+                or time.monotonic() - mem_cache[0] >= self._models_mem_ttl):
+            models_data = await self.get_available_models()
+            
+            # Rebuild the filtered list only when the catalog itself was reloaded
+            if models_data is not self._free_models_source:
+                self._free_models_cache = tuple(self._filter_free_models(models_data))
+                self._free_models_by_id = {model["id"]: model for model in self._free_models_cache}
+                self._free_models_source = models_data
+                self.free_models_generation += 1
+        free_models = self._free_models_cache
+        
+        # The tuple is immutable, so it is returned without copying
+        if limit is not None and limit > 0:
+            return free_models[:limit]
+        return free_models
+    
+    def get_model(self, model_id: str) -> Optional[Dict[str, Any]]:
+        """Get a free model by its ID from the last loaded free models list.
         
-        # Filter only completely free models
+        Args:
+            model_id: ID of the model
+            
+        Returns:
+            Model information dictionary, or None if the model is unknown
+        """
+        return self._free_models_by_id.get(model_id)
+    
+    @staticmethod
+    def _filter_free_models(models_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Select completely free models from the catalog, sorted by preference."""
         free_models = []
         for model in models_data:
-            # Check if name or ID contains "free"
-            is_free_in_name = "free" in model.get("id", "").lower() or "free" in model.get("name", "").lower()
+            # Check if name or ID contains "free" with a single scan
+            name_lc = (model.get("id", "") + "\0" + model.get("name", "")).lower()
             
             # Only include models that are explicitly marked as free
-            if is_free_in_name:
+            if "free" in name_lc:
                 free_models.append({
                     "id": model.get("id"),
                     "name": model.get("name"),
@@ -132,13 +254,9 @@ class OpenRouterClient:
         
         # Sort by context length (larger first)
         free_models.sort(key=lambda x: -x["context_length"])
-        
-        # Return models with optional limit
-        if limit is not None and limit > 0:
-            return free_models[:limit]
         return free_models
     
-    async def generate_response(self, model_id: str, prompt: str, chat_history: Optional[List[Dict[str, str]]] = None) -> str:
+    async def generate_response(self, model_id: str, prompt: str, chat_history: Optional[Iterable[Dict[str, str]]] = None) -> str:
         """Generate a response from a specified model.
         
         Args:
@@ -149,38 +267,84 @@ class OpenRouterClient:
         Returns:
             Generated response text from the language model
         """
-        if chat_history is None:
-            chat_history = []
+        data = {
+            "model": model_id,
+            "messages": self._build_messages(prompt, chat_history)
+        }
         
-        # Prepare messages for API
-        messages = []
+        session = await self._get_session()
+        async with session.post(
+            f"{self.base_url}/chat/completions",
+            json=data
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+            else:
+                error_text = None
+                response_data = orjson.loads(await response.read())
+                result = response_data.get("choices", [{}])[0].get("message", {}).get("content", "")
         
-        # Add chat history
-        for msg in chat_history:
-            messages.append(msg)
-            
-        # Add current request
-        messages.append({"role": "user", "content": prompt})
+        # Raise after the connection has been returned to the pool
+        if error_text is not None:
+            raise Exception(f"Error generating response: {error_text}")
+        
+        return result
+    
+    async def stream_response(self, model_id: str, prompt: str, chat_history: Optional[Iterable[Dict[str, str]]] = None) -> AsyncIterator[str]:
+        """Generate a response from a specified model, yielding text as it arrives.
         
+        Args:
+            model_id: ID of the model to use
+            prompt: User's query text
+            chat_history: Previous messages in the conversation
+            
+        Yields:
+            Consecutive fragments of the generated response text
+        """
         data = {
             "model": model_id,
-            "messages": messages
+            "messages": self._build_messages(prompt, chat_history),
+            "stream": True
         }
         
         session = await self._get_session()
         async with session.post(
             f"{self.base_url}/chat/completions",
-            headers=self.headers,
             json=data,
-            timeout=aiohttp.ClientTimeout(total=60)  # Extended timeout for response generation
+            timeout=self._STREAM_TIMEOUT
         ) as response:
             if response.status != 200:
                 error_text = await response.text()
-                raise Exception(f"Error generating response: {error_text}")
-            
-            response_data = await response.json()
-            result = response_data.get("choices", [{}])[0].get("message", {}).get("content", "")
+            else:
+                error_text = None
+                # Server-sent events: "data: {...}" lines, ": comment" keep-alives and blank separators
+                async for line in response.content:
+                    if not line.startswith(b"data:"):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == b"[DONE]":
+                        break
+                    
+                    chunk = orjson.loads(payload)
+                    if "error" in chunk:
+                        raise Exception(f"Error generating response: {chunk['error'].get('message', chunk['error'])}")
+                    
+                    choices = chunk.get("choices")
+                    if choices:
+                        content = choices[0].get("delta", {}).get("content")
+                        if content:
+                            yield content
         
-        await response.release()
+        # Raise after the connection has been returned to the pool
+        if error_text is not None:
+            raise Exception(f"Error generating response: {error_text}")
+    
+    @staticmethod
+    def _build_messages(prompt: str, chat_history: Optional[Iterable[Dict[str, str]]]) -> List[Dict[str, str]]:
+        """Build the messages payload from chat history and the current request."""
+        # Prepare messages for API, starting from chat history
+        messages = list(chat_history) if chat_history is not None else []
         
-        return result
+        # Add current request
+        messages.append({"role": "user", "content": prompt})
+        return messages
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""SQLite storage for user sessions, so they survive bot restarts."""
+
+import os
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Hashable, Iterable, List, Dict, Optional, Tuple
+
+import aiosqlite
+import orjson
+
+
+class SessionStore:
+    """Asynchronous SQLite storage of user sessions.
+    
+    Keeps the selected model and chat history of every user in a single
+    table. Requests are served by a small pool of connections, and the
+    database runs in WAL mode so writes don't block reads.
+    """
+    
+    def __init__(self, db_path: Optional[str] = None, pool_size: int = 8):
+        """Initialize the store with database location and pool size.
+        
+        Args:
+            db_path: Path to the SQLite database file, by default taken from
+                SESSIONS_DB_PATH or data/sessions.db
+            pool_size: Number of database connections to keep open
+        """
+        self.db_path = db_path or os.getenv("SESSIONS_DB_PATH") or os.path.join(
+            os.path.dirname(__file__), '..', '..', 'data', 'sessions.db'
+        )
+        self.pool_size = pool_size
+        self._pool: Optional[asyncio.Queue] = None  # Pool will be created by connect()
+    
+    async def connect(self):
+        """Open the connection pool and create the sessions table if needed."""
+        if self._pool is not None:
+            return
+        
+        # Create database directory if it doesn't exist
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        
+        pool = asyncio.Queue()
+        for i in range(self.pool_size):
+            connection = await aiosqlite.connect(self.db_path)
+            if i == 0:
+                # WAL mode is persistent, so it only has to be set once
+                await connection.execute("PRAGMA journal_mode=WAL")
+                await connection.execute(
+                    "CREATE TABLE IF NOT EXISTS sessions ("
+                    "user_id INTEGER PRIMARY KEY, model_id TEXT, history_json BLOB)"
+                )
+                await connection.commit()
+            pool.put_nowait(connection)
+        self._pool = pool
+    
+    async def close(self):
+        """Close all pooled connections."""
+        if self._pool is None:
+            return
+        
+        pool, self._pool = self._pool, None
+        while not pool.empty():
+            await pool.get_nowait().close()
+    
+    async def __aenter__(self) -> "SessionStore":
+        """Open the connection pool when entering an ``async with`` block."""
+        await self.connect()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        """Close the connection pool when leaving an ``async with`` block."""
+        await self.close()
+    
+    @asynccontextmanager
+    async def _acquire(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Borrow a connection from the pool for the duration of the block."""
+        connection = await self._pool.get()
+        try:
+            yield connection
+        finally:
+            self._pool.put_nowait(connection)
+    
+    async def load(self, user_id: int) -> Optional[Tuple[Optional[str], List[Dict[str, str]]]]:
+        """Load the stored session of a user.
+        
+        Args:
+            user_id: Telegram user ID
+        
+        Returns:
+            Tuple of selected model ID and chat history, or None if the user has no session
+        """
+        async with self._acquire() as connection:
+            async with connection.execute(
+                "SELECT model_id, history_json FROM sessions WHERE user_id = ?", (user_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
+        
+        if row is None:
+            return None
+        model_id, history_json = row
+        return model_id, orjson.loads(history_json) if history_json else []
+    
+    async def save(self, user_id: int, model_id: Optional[str], chat_history: List[Dict[str, str]]):
+        """Store the session of a user, replacing the previous one.
+        
+        Args:
+            user_id: Telegram user ID
+            model_id: ID of the selected model, None if no model is selected
+            chat_history: Messages in the conversation
+        """
+        async with self._acquire() as connection:
+            await connection.execute(
+                "INSERT OR REPLACE INTO sessions (user_id, model_id, history_json) VALUES (?, ?, ?)",
+                (user_id, model_id, orjson.dumps(chat_history))
+            )
+            await connection.commit()
+    
+    async def save_many(self, sessions: Iterable[Tuple[int, Optional[str], List[Dict[str, str]]]]):
+        """Store sessions of several users in a single transaction.
+        
+        Args:
+            sessions: Tuples of user ID, selected model ID and chat history
+        """
+        rows = [
+            (user_id, model_id, orjson.dumps(chat_history))
+            for user_id, model_id, chat_history in sessions
+        ]
+        async with self._acquire() as connection:
+            await connection.executemany(
+                "INSERT OR REPLACE INTO sessions (user_id, model_id, history_json) VALUES (?, ?, ?)",
+                rows
+            )
+            await connection.commit()
+
+
+class LRUSessionStore(OrderedDict):
+    """In-memory mapping of user sessions limited to the most recently used ones.
+    
+    Reading or writing a session marks it as recently used; once the store
+    grows past ``maxsize`` the least recently used session is evicted.
+    """
+    
+    def __init__(self, maxsize: int, items: Iterable[Tuple[Hashable, Any]] = ()):
+        """Initialize a store holding at most ``maxsize`` sessions.
+        
+        Args:
+            maxsize: Maximum number of sessions to keep
+            items: Initial key-value pairs, from least to most recently used
+        """
+        super().__init__()
+        self.maxsize = maxsize
+        for key, value in items:
+            self[key] = value
+    
+    def __getitem__(self, key: Hashable) -> Any:
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the value for key if it is stored, else default."""
+        if key in self:
+            return self[key]
+        return default
+    
+    def __setitem__(self, key: Hashable, value: Any):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+    
+    def copy(self) -> "LRUSessionStore":
+        """Return a shallow copy with the same size limit."""
+        return self.__class__(self.maxsize, self.items())
+    
+    def __reduce__(self):
+        # Recreate with the size limit before the items are restored
+        return self.__class__, (self.maxsize,), None, None, iter(self.items())
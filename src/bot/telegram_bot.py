@@ -10,46 +10,186 @@ Users can select models, engage in conversations, and manage chat histories.
 """
 
 import os
+import re
+import time
+import signal
+import asyncio
+import functools
 import logging
+from collections import deque
+from itertools import islice
+from typing import Dict, Optional, Tuple
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
-from dotenv import load_dotenv
-import sys
-import os
+from telegram.ext import AIORateLimiter, Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
 
-# Add root directory to PATH for imports
-sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 from src.api.openrouter_api import OpenRouterClient
+from src.bot.session_store import LRUSessionStore, SessionStore
 
-# Load environment variables
-load_dotenv()
-
-# Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', 
-    level=logging.INFO
-)
+# Environment variables and logging are configured once by main.py
 logger = logging.getLogger(__name__)
 
 # Initialize OpenRouter client (will be created when bot starts)
 openrouter_client = None
 
-# User session storage (in-memory for simplicity)
-user_sessions = {}
+# Background task warming the models cache at startup
+models_prefetch_task = None
+
+# Persistent user session storage (will be opened when bot starts)
+session_store = None
+
+# Sessions changed since they were last written to the store, flushed periodically
+SESSION_FLUSH_INTERVAL = 30
+dirty_sessions: Dict[int, dict] = {}
+saving_sessions: Dict[int, dict] = {}  # Sessions being written by the current flush
+session_flush_task = None
+session_flush_stop = None
+
+# In-memory cache of user sessions (LRU, least recently active users are evicted first)
+MAX_USER_SESSIONS = int(os.getenv("USER_SESSION_MAX", "10000"))
+user_sessions = LRUSessionStore(MAX_USER_SESSIONS)
+
+# Total length in characters of the most recent messages kept as conversation context
+HISTORY_MAX_CHARS = 12000
+
+# Inline keyboard callback data: "model:<id>", "page:<number>" or "noop"
+CALLBACK_PATTERN = re.compile(r'^(?:model:(?P<model>.+)|page:(?P<page>\d+)|noop)$')
+
+# Number of models shown on one page of the /models list
+MODELS_PER_PAGE = 5
+
+# Free models list the cached pages are built from and its catalog generation
+_models_generation = -1
+_models: Tuple[dict, ...] = ()
+
+# Minimum number of seconds between edits of a streamed reply
+STREAM_EDIT_INTERVAL = 1.0
+
+# Messages waiting for a response and the tasks answering them, per user
+MAX_PENDING_MESSAGES = 8
+SHUTDOWN_DRAIN_TIMEOUT = 10  # Seconds to let pending responses finish when the bot stops
+user_queues: Dict[int, asyncio.Queue] = {}
+user_workers: Dict[int, asyncio.Task] = {}
+
+async def _get_user_session(user_id: int, create: bool = False) -> Optional[dict]:
+    """Return the session of a user, marking it as recently used.
+    
+    Sessions missing from the in-memory cache are loaded from the session store.
+    
+    Args:
+        user_id: Telegram user ID
+        create: Whether to create an empty session if the user has none
+        
+    Returns:
+        Session dictionary, or None if it doesn't exist and create is False
+    """
+    session = user_sessions.get(user_id)
+    if session is not None:
+        return session
+    
+    # Evicted sessions with unsaved changes are newer than the stored ones
+    session = dirty_sessions.get(user_id) or saving_sessions.get(user_id)
+    if session is not None:
+        user_sessions[user_id] = session
+        return session
+    
+    stored = await session_store.load(user_id)
+    if stored is None and not create:
+        return None
+    
+    session = {"chat_history": deque(), "history_chars": 0}
+    if stored is not None:
+        model_id, chat_history = stored
+        if model_id is not None:
+            session["selected_model"] = model_id
+        session["chat_history"].extend(chat_history)
+        session["history_chars"] = sum(len(message["content"]) for message in chat_history)
+    
+    # Another update of the same user may have loaded the session meanwhile
+    cached = user_sessions.get(user_id)
+    if cached is not None:
+        return cached
+    user_sessions[user_id] = session
+    return session
+
+def _add_to_history(session: dict, role: str, content: str) -> dict:
+    """Append a message to the chat history of a session and return it."""
+    message = {
+        "role": role,
+        "content": content
+    }
+    session["chat_history"].append(message)
+    session["history_chars"] += len(content)
+    return message
 
-# Model storage (global for simplicity)
-model_storage = {}
+def _remove_message(session: dict, message: dict) -> None:
+    """Remove a message from the chat history of a session if it is still there.
+    
+    The history may have been reset meanwhile, so the message is looked up
+    by identity, starting from the newest one.
+    """
+    chat_history = session["chat_history"]
+    for index in range(len(chat_history) - 1, -1, -1):
+        if chat_history[index] is message:
+            del chat_history[index]
+            session["history_chars"] -= len(message["content"])
+            return
+
+def _trim_history(session: dict) -> None:
+    """Drop the oldest messages until the history fits into HISTORY_MAX_CHARS.
+    
+    The last user message and model response are always kept.
+    """
+    chat_history = session["chat_history"]
+    while session["history_chars"] > HISTORY_MAX_CHARS and len(chat_history) > 2:
+        removed = chat_history.popleft()
+        session["history_chars"] -= len(removed["content"])
+
+def _save_user_session(user_id: int, session: dict) -> None:
+    """Schedule the session of a user to be written by the next flush."""
+    dirty_sessions[user_id] = session
+
+async def flush_sessions() -> None:
+    """Write sessions changed since the last flush to the session store."""
+    if not dirty_sessions:
+        return
+    
+    # Sessions stay visible to _get_user_session until they are committed,
+    # so one evicted from the cache meanwhile isn't reloaded from a stale row
+    saving_sessions.update(dirty_sessions)
+    dirty_sessions.clear()
+    try:
+        await session_store.save_many(
+            (user_id, session.get("selected_model"), list(session["chat_history"]))
+            for user_id, session in saving_sessions.items()
+        )
+    except Exception:
+        logger.exception("Error saving %d sessions", len(saving_sessions))
+        # Retry with the next flush unless they were changed again meanwhile
+        for user_id, session in saving_sessions.items():
+            dirty_sessions.setdefault(user_id, session)
+    finally:
+        saving_sessions.clear()
+
+async def flush_sessions_periodically(stop_event: asyncio.Event) -> None:
+    """Flush changed sessions every SESSION_FLUSH_INTERVAL seconds until stop_event is set.
+    
+    The loop is stopped through the event rather than cancelled, so a flush
+    that is in progress is never interrupted in the middle of a write.
+    """
+    while not stop_event.is_set():
+        try:
+            await asyncio.wait_for(stop_event.wait(), SESSION_FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            await flush_sessions()
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send welcome message when the command /start is issued."""
     user = update.effective_user
-    await update.message.reply_text(
-        f'Hello, {user.first_name}! I\'m a chat bot using models from OpenRouter. '
-        f'Use /models to select a model for chatting.'
-    )
     
-    # Add welcome message with feature description
+    # Greeting and feature description go out in one message
     await update.message.reply_text(
+        f'Hello, {user.first_name}! I\'m a chat bot using models from OpenRouter. '
+        'Use /models to select a model for chatting.\n\n'
         'I can help you chat with various language models. '
         'I have the following features:\n'
         '• Choose from 10 popular free models on OpenRouter\n'
@@ -71,130 +211,142 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 async def display_models(update: Update, context: ContextTypes.DEFAULT_TYPE, page=0) -> None:
     """Display available models for selection with pagination."""
     # For callback queries, we need to handle differently
-    is_callback = isinstance(update, Update) and update.callback_query
+    cq = update.callback_query
+    is_callback = cq is not None
     
     # Get the appropriate message object
-    message = update.callback_query.message if is_callback else update.message
-    
-    if not is_callback:
-        await message.reply_text('Fetching available models...')
+    message = cq.message if is_callback else update.message
     
     try:
         # Get all free models from OpenRouter
         global openrouter_client
         free_models = await openrouter_client.get_free_models()
+        generation = openrouter_client.free_models_generation
         
         if not free_models:
             if is_callback:
-                await update.callback_query.answer("No models found")
-                await update.callback_query.edit_message_text('Could not find any free models. Please try again later.')
+                await cq.answer("No models found")
+                await cq.edit_message_text('Could not find any free models. Please try again later.')
             else:
                 await message.reply_text('Could not find any free models. Please try again later.')
             return
         
-        # Save all models to global storage
-        global model_storage
-        model_storage = {model['id']: model for model in free_models}
-        
-        # Calculate pagination
-        models_per_page = 5
-        total_models = len(free_models)
-        total_pages = (total_models + models_per_page - 1) // models_per_page  # Ceiling division
-        
-        # Ensure page is in valid range
-        page = max(0, min(page, total_pages - 1))
-        
-        # Get models for current page
-        start_idx = page * models_per_page
-        end_idx = min(start_idx + models_per_page, total_models)
-        current_page_models = free_models[start_idx:end_idx]
-        
-        # Create keyboard with model options
-        keyboard = []
-        for i, model in enumerate(current_page_models):
-            # Add 🆓 emoji for completely free models
-            model_name = model['name']
-            if model.get("is_free", False):
-                model_name = f"🆓 {model_name}"
-                
-            keyboard.append([
-                InlineKeyboardButton(model_name, callback_data=f"model:{model['id']}")
-            ])
-        
-        # Add navigation buttons
-        nav_buttons = []
-        
-        # Previous page button
-        if page > 0:
-            nav_buttons.append(InlineKeyboardButton("◀️ Prev", callback_data=f"page:{page-1}"))
-        
-        # Page indicator
-        nav_buttons.append(InlineKeyboardButton(f"📄 {page+1}/{total_pages}", callback_data="noop"))
-        
-        # Next page button
-        if page < total_pages - 1:
-            nav_buttons.append(InlineKeyboardButton("Next ▶️", callback_data=f"page:{page+1}"))
-        
-        # Add navigation row
-        keyboard.append(nav_buttons)
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        # Modify text to include page info and total model count
-        select_text = f'Available models ({total_models} total) - Page {page+1}/{total_pages}:\n\nSelect a model to chat with:'
+        # Text and keyboard of a page only depend on the models list and page number
+        select_text, reply_markup = _get_models_page(free_models, generation, page)
         
         # Edit or send message based on context
         if is_callback:
-            await update.callback_query.answer()
-            await update.callback_query.edit_message_text(select_text, reply_markup=reply_markup)
+            await cq.answer()
+            await cq.edit_message_text(select_text, reply_markup=reply_markup)
         else:
             await message.reply_text(select_text, reply_markup=reply_markup)
     
-    except Exception as e:
-        logger.error(f"Error fetching models: {e}")
+    except Exception:
+        logger.exception("Error fetching models for user %s", update.effective_user.id)
+        error_text = 'Sorry, the models list could not be loaded. Please try again later.'
         if is_callback:
-            await update.callback_query.answer("Error loading models")
-            await update.callback_query.edit_message_text(f'Error retrieving models: {str(e)}')
+            await cq.answer("Error loading models")
+            await cq.edit_message_text(error_text)
         else:
-            await message.reply_text(f'Error retrieving models: {str(e)}')
+            await message.reply_text(error_text)
 
-async def page_navigation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle pagination navigation for model selection."""
-    query = update.callback_query
+def _get_models_page(free_models: Tuple[dict, ...], generation: int, page: int) -> Tuple[str, InlineKeyboardMarkup]:
+    """Return text and keyboard of a models list page, built once per catalog generation.
     
-    # "noop" callback does nothing 
-    if query.data == "noop":
-        await query.answer("Current page info")
-        return
+    Cached pages are dropped only when the client rebuilt the free models list.
+    """
+    global _models_generation, _models
+    if generation != _models_generation:
+        _models_generation = generation
+        _models = free_models
+        _build_models_page.cache_clear()
+    return _build_models_page(generation, page)
+
+@functools.lru_cache(maxsize=64)
+def _build_models_page(generation: int, page: int) -> Tuple[str, InlineKeyboardMarkup]:
+    """Build text and keyboard of a models list page.
+    
+    Args:
+        generation: Catalog generation of the free models list, used as the cache key
+        page: Requested page number, clamped to the valid range
+        
+    Returns:
+        Tuple of message text and inline keyboard markup
+    """
+    # Calculate pagination
+    models = _models
+    total_models = len(models)
+    total_pages = (total_models + MODELS_PER_PAGE - 1) // MODELS_PER_PAGE  # Ceiling division
+    
+    # Ensure page is in valid range
+    page = max(0, min(page, total_pages - 1))
+    
+    # Get models for current page
+    start_idx = page * MODELS_PER_PAGE
+    end_idx = min(start_idx + MODELS_PER_PAGE, total_models)
+    
+    # Create keyboard with model options, adding 🆓 emoji for completely free models
+    keyboard = [
+        [InlineKeyboardButton(
+            f"🆓 {model['name']}" if model.get("is_free", False) else model['name'],
+            callback_data=f"model:{model['id']}"
+        )] for model in islice(models, start_idx, end_idx)
+    ]
+    
+    # Add navigation buttons
+    nav_buttons = []
     
-    # Extract page number from callback data
-    page = int(query.data.split(':')[1])
+    # Previous page button
+    if page > 0:
+        nav_buttons.append(InlineKeyboardButton("◀️ Prev", callback_data=f"page:{page-1}"))
+    
+    # Page indicator
+    nav_buttons.append(InlineKeyboardButton(f"📄 {page+1}/{total_pages}", callback_data="noop"))
+    
+    # Next page button
+    if page < total_pages - 1:
+        nav_buttons.append(InlineKeyboardButton("Next ▶️", callback_data=f"page:{page+1}"))
+    
+    # Add navigation row
+    keyboard.append(nav_buttons)
+    
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    # Modify text to include page info and total model count
+    select_text = f'Available models ({total_models} total) - Page {page+1}/{total_pages}:\n\nSelect a model to chat with:'
+    return select_text, reply_markup
+
+async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Route inline keyboard callbacks matched by CALLBACK_PATTERN to their handlers."""
+    match = context.match
     
-    # Display models for the selected page
-    await display_models(update, context, page=page)
+    if match["model"] is not None:
+        await model_selection(update, context, match["model"])
+    elif match["page"] is not None:
+        # Display models for the selected page
+        await display_models(update, context, page=int(match["page"]))
+    else:
+        # "noop" callback does nothing
+        await update.callback_query.answer("Current page info")
 
-async def model_selection(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def model_selection(update: Update, context: ContextTypes.DEFAULT_TYPE, model_id: str) -> None:
     """Handle model selection from inline keyboard."""
     query = update.callback_query
     await query.answer()
     
-    # Extract model ID from callback data
-    model_id = query.data.split(':')[1]
     user_id = update.effective_user.id
     
-    # Initialize user session if it doesn't exist
-    if user_id not in user_sessions:
-        user_sessions[user_id] = {"chat_history": []}
+    # Set selected model, initializing user session if it doesn't exist
+    session = await _get_user_session(user_id, create=True)
+    session["selected_model"] = model_id
+    _save_user_session(user_id, session)
     
-    # Set selected model
-    user_sessions[user_id]["selected_model"] = model_id
-    
-    # Get model name from global storage
-    model_name = "selected model"
-    if model_id in model_storage:
-        model_name = model_storage[model_id]['name']
-        if model_storage[model_id].get("is_free", False):
-            model_name = f"🆓 {model_name}"
+    # Get model name from the client's models list with a single lookup
+    model = openrouter_client.get_model(model_id)
+    if model is None:
+        model_name = "selected model"
+    else:
+        model_name = f"🆓 {model['name']}" if model.get("is_free") else model['name']
     
     await query.edit_message_text(f'You selected model: {model_name}\n\nYou can now start chatting. Just send a message.')
 
@@ -202,64 +354,165 @@ async def reset_chat(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
     """Reset chat history for user."""
     user_id = update.effective_user.id
     
-    if user_id in user_sessions:
-        user_sessions[user_id]["chat_history"] = []
+    session = await _get_user_session(user_id)
+    if session is not None:
+        session["chat_history"].clear()
+        session["history_chars"] = 0
+        _save_user_session(user_id, session)
     
     await update.message.reply_text('Chat history has been reset. You can continue chatting with your selected model.')
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle user messages and generate responses using the selected model."""
+    """Queue user messages to be answered by the selected model.
+    
+    Messages are answered in order by a background worker per user, so a slow
+    model response doesn't hold up updates from other users.
+    """
     user_id = update.effective_user.id
     
     # Check if user has selected a model
-    if user_id not in user_sessions or "selected_model" not in user_sessions[user_id]:
+    session = await _get_user_session(user_id)
+    if session is None or session.get("selected_model") is None:
         await update.message.reply_text('Please select a model first using the /models command')
         return
     
-    # Get user message
+    queue = user_queues.get(user_id)
+    if queue is None:
+        queue = user_queues[user_id] = asyncio.Queue(maxsize=MAX_PENDING_MESSAGES)
+    
+    try:
+        queue.put_nowait((update, context))
+    except asyncio.QueueFull:
+        await update.message.reply_text('You are sending messages too fast. Please wait for the previous responses.')
+        return
+    
+    # Start a worker for the user unless one is already running
+    if user_id not in user_workers:
+        user_workers[user_id] = asyncio.create_task(_process_user_messages(user_id, queue))
+
+async def _process_user_messages(user_id: int, queue: asyncio.Queue) -> None:
+    """Answer queued messages of a user one at a time until the queue is empty."""
+    try:
+        while not queue.empty():
+            update, context = queue.get_nowait()
+            try:
+                await _answer_message(update, context)
+            except Exception:
+                logger.exception("Error processing message for user %s", user_id)
+    finally:
+        # No await between the empty check and here, so no message can be missed
+        del user_workers[user_id]
+        del user_queues[user_id]
+
+async def _answer_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Generate a response to a user message using the selected model."""
+    user_id = update.effective_user.id
+    
+    # Selected model may have changed while the message was queued
+    session = await _get_user_session(user_id, create=True)
+    selected_model = session.get("selected_model")
+    if selected_model is None:
+        await update.message.reply_text('Please select a model first using the /models command')
+        return
+    
+    # Get user message and the history before it; /reset may clear the
+    # session history while the response is being generated
     user_message = update.message.text
-    selected_model = user_sessions[user_id]["selected_model"]
+    history = list(session["chat_history"])
     
     # Add user message to chat history
-    user_sessions[user_id]["chat_history"].append({
-        "role": "user",
-        "content": user_message
-    })
+    user_entry = _add_to_history(session, "user", user_message)
     
-    # Send typing indicator
-    await context.bot.send_chat_action(chat_id=update.effective_chat.id, action='typing')
+    # Send typing indicator without waiting for it, it is only cosmetic
+    typing_task = asyncio.create_task(
+        context.bot.send_chat_action(chat_id=update.effective_chat.id, action='typing')
+    )
     
+    reply = None
+    answered = False
     try:
+        # Send a placeholder that is filled in while the response streams
+        reply = await update.message.reply_text('…')
+        
         # Generate response from the model
         global openrouter_client
-        response = await openrouter_client.generate_response(
-            selected_model,
-            user_message,
-            user_sessions[user_id]["chat_history"][:-1]  # Exclude the last message
-        )
+        parts = []
+        sent_text = ''
+        last_edit = time.monotonic()
+        async for part in openrouter_client.stream_response(selected_model, user_message, history):
+            parts.append(part)
+            
+            # Edit the reply periodically to stay within Telegram's edit rate limits;
+            # Telegram trims whitespace, so only a change in the stripped text is an edit
+            now = time.monotonic()
+            if now - last_edit >= STREAM_EDIT_INTERVAL:
+                text = ''.join(parts).strip()
+                if text and text != sent_text:
+                    await reply.edit_text(text)
+                    sent_text = text
+                last_edit = now
         
-        # Add model response to chat history
-        user_sessions[user_id]["chat_history"].append({
-            "role": "assistant",
-            "content": response
-        })
+        response = ''.join(parts)
+        if not response.strip():
+            # Don't keep an unanswered message in history or leave the placeholder in place
+            _remove_message(session, user_entry)
+            _save_user_session(user_id, session)
+            await reply.edit_text('The model returned an empty response. Please try again or select another model with /models.')
+            return
         
-        # Limit chat history to 10 most recent messages to avoid context overflow
-        if len(user_sessions[user_id]["chat_history"]) > 10:
-            user_sessions[user_id]["chat_history"] = user_sessions[user_id]["chat_history"][-10:]
+        # Add model response to chat history, dropping the oldest messages over the budget
+        _add_to_history(session, "assistant", response)
+        answered = True
+        _trim_history(session)
+        _save_user_session(user_id, session)
         
-        # Send response to user
-        await update.message.reply_text(response)
+        # Send the complete response to user
+        if response.strip() != sent_text:
+            await reply.edit_text(response)
+    
+    except asyncio.CancelledError:
+        # The bot is stopping: don't keep the unanswered message in history,
+        # and always let the cancellation through
+        if not answered:
+            _remove_message(session, user_entry)
+            _save_user_session(user_id, session)
+            if reply is not None:
+                try:
+                    await reply.edit_text('The bot is restarting — please send your message again.')
+                except Exception:
+                    logger.warning("Error editing reply of user %s on shutdown", user_id, exc_info=True)
+        raise
     
-    except Exception as e:
-        logger.error(f"Error generating response: {e}")
-        await update.message.reply_text(f'An error occurred while generating response: {str(e)}')
+    except Exception:
+        logger.exception("Error generating response for user %s", user_id)
+        if not answered:
+            _remove_message(session, user_entry)
+            _save_user_session(user_id, session)
+        
+        # Show the error in place of the placeholder instead of leaving it behind
+        error_text = 'Sorry, something went wrong — please try again.'
+        if reply is not None:
+            await reply.edit_text(error_text)
+        else:
+            await update.message.reply_text(error_text)
+    
+    finally:
+        # A failed typing indicator shouldn't affect the response
+        typing_result, = await asyncio.gather(typing_task, return_exceptions=True)
+        if isinstance(typing_result, Exception):
+            logger.warning("Error sending typing indicator: %s", typing_result)
+
+async def prefetch_models() -> None:
+    """Load the free models list in the background so the first /models is instant."""
+    try:
+        free_models = await openrouter_client.get_free_models()
+        logger.info("Prefetched %d free models", len(free_models))
+    except Exception:
+        # Not fatal: /models will fetch the list on demand
+        logger.warning("Error prefetching models", exc_info=True)
 
 async def main() -> None:
     """Initialize and run the bot."""
-    # Import asyncio inside the function
-    import asyncio
-    
     # Initialize OpenRouter client
     global openrouter_client
     openrouter_client = OpenRouterClient()
@@ -270,17 +523,30 @@ async def main() -> None:
         logger.error("Telegram bot token not found in environment variables")
         return
     
-    # Create application
-    application = Application.builder().token(token).build()
+    # Receive updates through a webhook instead of long polling if enabled
+    use_webhook = os.getenv("USE_WEBHOOK", "").lower() in ("1", "true", "yes")
+    public_url = os.getenv("PUBLIC_URL", "").rstrip("/")
+    if use_webhook and not public_url:
+        logger.error("PUBLIC_URL must be set in environment variables when USE_WEBHOOK is enabled")
+        return
+    
+    # Create application; the rate limiter keeps all Bot API calls within Telegram's flood limits
+    rate_limiter = AIORateLimiter(
+        overall_max_rate=30,
+        overall_time_period=1,
+        group_max_rate=20,
+        group_time_period=60
+    )
+    application = Application.builder().token(token).rate_limiter(rate_limiter).build()
     
-    # Setup bot commands menu
+    # Bot commands menu, registered while the application initializes
     from telegram import BotCommand
-    await application.bot.set_my_commands([
+    bot_commands = [
         BotCommand("start", "Start the bot and get a welcome message"),
         BotCommand("help", "Show usage instructions"),
         BotCommand("models", "Select a free model for conversation"),
         BotCommand("reset", "Clear conversation history")
-    ])
+    ]
     
     # Command handlers
     application.add_handler(CommandHandler("start", start))
@@ -289,39 +555,85 @@ async def main() -> None:
     application.add_handler(CommandHandler("reset", reset_chat))
     
     # Callback query handlers
-    application.add_handler(CallbackQueryHandler(model_selection, pattern=r'^model:'))
-    application.add_handler(CallbackQueryHandler(page_navigation, pattern=r'^page:'))
-    application.add_handler(CallbackQueryHandler(page_navigation, pattern=r'^noop$'))
+    application.add_handler(CallbackQueryHandler(handle_callback, pattern=CALLBACK_PATTERN))
     
     # Message handler
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
     
-    # Start the bot
-    logger.info("Bot is starting...")
-    await application.initialize()
-    await application.start()
-    await application.updater.start_polling()
-    logger.info("Bot is running. Press Ctrl+C to stop.")
-    
-    # Run the bot until pressing Ctrl-C
-    # In the new version of python-telegram-bot, the idle method is directly in asyncio
-    try:
-        # Use asyncio.Event to block the main thread until completion
+    # Open the user session database together with the OpenRouter connection pool;
+    # both stay open for the whole bot lifetime and close after the bot stops
+    global session_store
+    session_store = SessionStore()
+    async with openrouter_client, session_store:
+        # Handle Ctrl+C (SIGINT) and SIGTERM, which is sent on redeploys, from the
+        # start, so a signal during startup still runs the cleanup below
         stop_event = asyncio.Event()
-        await stop_event.wait()
-    except (KeyboardInterrupt, SystemExit):
-        # Properly stop the application when Ctrl+C is pressed
-        logger.info("Shutting down the bot...")
-    finally:
-        # Close OpenRouter client session
-        if openrouter_client:
-            logger.info("Closing OpenRouter client...")
-            await openrouter_client.close()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except NotImplementedError:
+                # Not supported on Windows, where Ctrl+C cancels main() instead
+                pass
         
-        # Stop the application
-        await application.stop()
-        await application.shutdown()
-
-if __name__ == '__main__':
-    import asyncio
-    asyncio.run(main())
+        # Warm the models cache concurrently with the bot startup
+        global models_prefetch_task
+        models_prefetch_task = asyncio.create_task(prefetch_models())
+        
+        # Write changed sessions in the background instead of on every message
+        global session_flush_task, session_flush_stop
+        session_flush_stop = asyncio.Event()
+        session_flush_task = asyncio.create_task(flush_sessions_periodically(session_flush_stop))
+        
+        try:
+            # Start the bot
+            logger.info("Bot is starting...")
+            # Setting the commands menu doesn't depend on initialization, so overlap the two requests
+            await asyncio.gather(
+                application.initialize(),
+                application.bot.set_my_commands(bot_commands)
+            )
+            await application.start()
+            if use_webhook:
+                # Telegram pushes updates to PUBLIC_URL; the secret token path keeps the endpoint private
+                await application.updater.start_webhook(
+                    listen="0.0.0.0",
+                    port=int(os.getenv("PORT", "8443")),
+                    url_path=token,
+                    webhook_url=f"{public_url}/{token}"
+                )
+            else:
+                await application.updater.start_polling()
+            logger.info("Bot is running. Press Ctrl+C to stop.")
+            
+            # Run the bot until it is stopped by a signal
+            await stop_event.wait()
+            logger.info("Shutting down the bot...")
+        finally:
+            # Stop the prefetch if it is still running
+            if not models_prefetch_task.done():
+                models_prefetch_task.cancel()
+            
+            # Stop fetching new updates, then let the application finish the pending ones;
+            # either may not have been started if the startup failed
+            if application.updater.running:
+                await application.updater.stop()
+            if application.running:
+                await application.stop()
+            
+            # Let responses that are being generated finish, then cancel the rest
+            workers = list(user_workers.values())
+            if workers:
+                _, pending = await asyncio.wait(workers, timeout=SHUTDOWN_DRAIN_TIMEOUT)
+                for worker in pending:
+                    worker.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+            
+            # Wait for a flush in progress to finish, then save the remaining
+            # session changes while the store is still open
+            session_flush_stop.set()
+            await session_flush_task
+            await flush_sessions()
+            
+            await application.shutdown()
+            logger.info("Closing OpenRouter client and session store...")
@@ -3,13 +3,10 @@
 
 import unittest
 import os
-import sys
 import json
 from dotenv import load_dotenv
 import asyncio
-
-# Add the project root directory to sys.path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from unittest.mock import MagicMock
 
 # Import OpenRouter client
 from src.api.openrouter_api import OpenRouterClient
@@ -21,19 +18,27 @@ load_dotenv()
 class TestOpenRouterAPI(unittest.IsolatedAsyncioTestCase):
     """Tests for OpenRouter API"""
     
+    @classmethod
+    def setUpClass(cls):
+        """Create one client shared by all tests"""
+        cls.client = OpenRouterClient()
+    
     def setUp(self):
         """Set up environment for tests"""
-        self.client = OpenRouterClient()
         # Check if API key is available
         self.api_key_available = bool(os.getenv("OPENROUTER_API_KEY"))
         
         # Display documentation information
         self.print_documentation_info()
     
+    async def asyncSetUp(self):
+        """Open client session in the event loop of the current test"""
+        await self.client.connect()
+    
     async def asyncTearDown(self):
         """Close client session after each test"""
-        if self.client:
-            await self.client.close()
+        # Every test runs in its own event loop, so the session can't outlive the test
+        await self.client.close()
 
     def print_documentation_info(self):
         """Displays information about documentation access"""
@@ -79,7 +84,7 @@ class TestOpenRouterAPI(unittest.IsolatedAsyncioTestCase):
         print("Test: Getting list of free models")
         # Using await instead of asyncio.run()
         free_models = await self.client.get_free_models(limit=10)
-        self.assertIsInstance(free_models, list, "get_free_models should return a list")
+        self.assertIsInstance(free_models, tuple, "get_free_models should return a tuple")
         
         print(f"✓ Received {len(free_models)} free models")
         
@@ -126,6 +131,12 @@ class TestOpenRouterAPI(unittest.IsolatedAsyncioTestCase):
         print(f"✓ Received response of {len(response)} characters")
         print(f"Response: {response[:100]}...")
     
+    @staticmethod
+    def _read_json(path):
+        """Read and parse a JSON file"""
+        with open(path, 'rb') as f:
+            return json.load(f)
+    
     async def test_models_cache(self):
         """Test for model caching"""
         if not self.api_key_available:
@@ -144,9 +155,8 @@ class TestOpenRouterAPI(unittest.IsolatedAsyncioTestCase):
         # Check that the cache was created
         self.assertTrue(os.path.exists(cache_file), "Cache file should be created")
         
-        # Load cache and check its contents
-        with open(cache_file, 'r') as f:
-            cached_models = json.load(f)
+        # Load cache and check its contents - in a thread so the event loop isn't blocked
+        cached_models = await asyncio.to_thread(self._read_json, cache_file)
         
         self.assertEqual(len(cached_models), len(models), "Number of models in cache should match the received ones")
         print(f"✓ Cache successfully created with {len(cached_models)} models")
@@ -157,5 +167,68 @@ class TestOpenRouterAPI(unittest.IsolatedAsyncioTestCase):
         print("✓ Cache successfully used for repeat requests")
 
 
+class _FakeStreamResponse:
+    """Response that returns canned server-sent event lines"""
+    
+    def __init__(self, lines, status=200):
+        self.lines = lines
+        self.status = status
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+    
+    @property
+    def content(self):
+        async def iterate():
+            for line in self.lines:
+                yield line
+        return iterate()
+    
+    async def text(self):
+        return b"".join(self.lines).decode()
+
+
+class TestStreamResponse(unittest.IsolatedAsyncioTestCase):
+    """Tests for parsing of streamed responses, without API requests"""
+    
+    async def collect(self, lines, status=200):
+        """Stream a response made of canned lines and return the yielded parts"""
+        client = OpenRouterClient()
+        client._session = MagicMock(closed=False)
+        client._session.post.return_value = _FakeStreamResponse(lines, status)
+        return [part async for part in client.stream_response("test/model:free", "Hi")]
+    
+    async def test_yields_content_until_done(self):
+        """Test for skipping comments and empty chunks and stopping at [DONE]"""
+        parts = await self.collect([
+            b": OPENROUTER PROCESSING\n",
+            b"\n",
+            b'data: {"choices": [{"delta": {"role": "assistant"}}]}\n',
+            b'data: {"choices": [{"delta": {"content": "Hel"}}]}\n',
+            b"\n",
+            b'data:{"choices": [{"delta": {"content": "lo"}}]}\n',
+            b'data: {"choices": []}\n',
+            b"data: [DONE]\n",
+            b'data: {"choices": [{"delta": {"content": "ignored"}}]}\n'
+        ])
+        self.assertEqual(parts, ["Hel", "lo"], "Only content deltas before [DONE] should be yielded")
+    
+    async def test_error_chunk_raises(self):
+        """Test for raising on an error sent in the middle of the stream"""
+        with self.assertRaisesRegex(Exception, "Rate limit exceeded"):
+            await self.collect([
+                b'data: {"choices": [{"delta": {"content": "Hel"}}]}\n',
+                b'data: {"error": {"message": "Rate limit exceeded", "code": 429}}\n'
+            ])
+    
+    async def test_error_status_raises(self):
+        """Test for raising when the request is rejected"""
+        with self.assertRaisesRegex(Exception, "No endpoints found"):
+            await self.collect([b'{"error": {"message": "No endpoints found"}}'], status=404)
+
+
 if __name__ == "__main__":
     unittest.main()
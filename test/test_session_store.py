@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import pickle
+import tempfile
+
+# Import session store
+from src.bot.session_store import LRUSessionStore, SessionStore
+
+# Use IsolatedAsyncioTestCase for asynchronous tests
+class TestSessionStore(unittest.IsolatedAsyncioTestCase):
+    """Tests for SQLite session store"""
+    
+    async def asyncSetUp(self):
+        """Open a store backed by a temporary database"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'sessions.db')
+        self.store = SessionStore(self.db_path, pool_size=2)
+        await self.store.connect()
+    
+    async def asyncTearDown(self):
+        """Close the store and remove the temporary database"""
+        await self.store.close()
+        self.temp_dir.cleanup()
+    
+    async def test_load_missing_session(self):
+        """Test for loading a session of an unknown user"""
+        self.assertIsNone(await self.store.load(1), "Unknown user should have no session")
+    
+    async def test_save_and_load_session(self):
+        """Test for saving and loading a session"""
+        history = [
+            {"role": "user", "content": "Hello"},
+            {"role": "assistant", "content": "Hi! How can I help?"}
+        ]
+        await self.store.save(1, "meta-llama/llama-4-scout:free", history)
+        
+        model_id, loaded_history = await self.store.load(1)
+        self.assertEqual(model_id, "meta-llama/llama-4-scout:free", "Selected model should be restored")
+        self.assertEqual(loaded_history, history, "Chat history should be restored")
+        
+        # Saving again replaces the previous session
+        await self.store.save(1, None, [])
+        self.assertEqual(await self.store.load(1), (None, []), "Session should be replaced")
+    
+    async def test_save_many_sessions(self):
+        """Test for saving sessions of several users at once"""
+        await self.store.save_many([
+            (1, "meta-llama/llama-4-scout:free", [{"role": "user", "content": "Hi"}]),
+            (2, None, [])
+        ])
+        
+        self.assertEqual((await self.store.load(1))[0], "meta-llama/llama-4-scout:free", "First session should be stored")
+        self.assertEqual(await self.store.load(2), (None, []), "Second session should be stored")
+    
+    async def test_session_survives_reopen(self):
+        """Test for keeping sessions after the store is reopened"""
+        await self.store.save(1, "deepseek/deepseek-v3-base:free", [{"role": "user", "content": "Hi"}])
+        await self.store.close()
+        
+        async with SessionStore(self.db_path, pool_size=1) as store:
+            model_id, history = await store.load(1)
+        self.assertEqual(model_id, "deepseek/deepseek-v3-base:free", "Selected model should be persisted")
+        self.assertEqual(len(history), 1, "Chat history should be persisted")
+
+
+
+class TestLRUSessionStore(unittest.TestCase):
+    """Tests for in-memory LRU session store"""
+    
+    def test_evicts_least_recently_used(self):
+        """Test for evicting the least recently used session"""
+        sessions = LRUSessionStore(maxsize=2)
+        sessions[1] = {"chat_history": []}
+        sessions[2] = {"chat_history": []}
+        
+        # Reading a session marks it as recently used
+        self.assertIsNotNone(sessions.get(1), "Stored session should be returned")
+        sessions[3] = {"chat_history": []}
+        
+        self.assertEqual(list(sessions), [1, 3], "Least recently used session should be evicted")
+        self.assertIsNone(sessions.get(2), "Evicted session should not be returned")
+    
+    def test_copy_keeps_size_limit(self):
+        """Test for copying and pickling the store with its size limit"""
+        sessions = LRUSessionStore(maxsize=2)
+        sessions[1] = {"chat_history": []}
+        sessions[2] = {"chat_history": []}
+        
+        for copied in (sessions.copy(), pickle.loads(pickle.dumps(sessions))):
+            self.assertIsInstance(copied, LRUSessionStore, "Copy should be a session store")
+            self.assertEqual(copied.maxsize, 2, "Copy should keep the size limit")
+            self.assertEqual(list(copied), [1, 2], "Copy should keep the usage order")
+            copied[3] = {"chat_history": []}
+            self.assertEqual(list(copied), [2, 3], "Copy should evict its own sessions")
+        
+        self.assertEqual(list(sessions), [1, 2], "Original should not change")
+
+
+if __name__ == "__main__":
+    unittest.main()
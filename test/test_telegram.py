@@ -3,33 +3,103 @@
 
 import unittest
 import os
+import io
+import re
 import sys
 from dotenv import load_dotenv
-import requests
+import httpx
 import logging
 import asyncio
-from telegram import Bot
 
-# Set up logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+# Set up logging unless the test runner has already configured it
+if not logging.getLogger().handlers:
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
 logger = logging.getLogger(__name__)
 
-# Add the project root directory to sys.path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+# Load environment variables, skipping the .env file if the token is already set
+if "TELEGRAM_BOT_TOKEN" not in os.environ:
+    load_dotenv()
 
-# Load environment variables
-load_dotenv()
+# Bot token: numeric bot ID and a secret of more than 30 characters, separated by ":"
+_TOKEN_RE = re.compile(r"^(\d+):([A-Za-z0-9_-]{31,})$")
 
+# All tests need the bot token, so without it the whole class is skipped before any setup
+_HAS_TOKEN = bool(os.getenv("TELEGRAM_BOT_TOKEN"))
+
+@unittest.skipUnless(_HAS_TOKEN, "TELEGRAM_BOT_TOKEN not set")
 class TestTelegramAPI(unittest.TestCase):
     """Tests for Telegram Bot API"""
     
+    @classmethod
+    def setUpClass(cls):
+        """Request bot information once for all tests"""
+        cls._http_ok = False
+        cls._api_ok = False
+        cls._bot_info = None
+        cls._getme_error = None
+        cls._bot = None
+        cls._aclient = None
+        
+        # One event loop for the whole class, so clients can be reused across tests
+        cls._loop = asyncio.new_event_loop()
+        
+        token = os.getenv("TELEGRAM_BOT_TOKEN")
+        
+        # HTTP/2 client for raw API requests, multiplexed over a single keep-alive connection
+        cls._aclient = httpx.AsyncClient(
+            http2=True,
+            timeout=5.0,
+            limits=httpx.Limits(max_keepalive_connections=8)
+        )
+        
+        cls._run(cls._check_getme_http(token))
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Close the clients and the event loop shared by all tests"""
+        # Connections belong to the class event loop, so close them before it
+        if cls._aclient is not None:
+            cls._run(cls._aclient.aclose())
+        if cls._bot is not None:
+            cls._run(cls._bot.shutdown())
+        cls._loop.close()
+    
+    @classmethod
+    def _run(cls, coro):
+        """Run a coroutine on the class event loop"""
+        return cls._loop.run_until_complete(coro)
+    
+    @classmethod
+    async def _check_getme_http(cls, token):
+        """Verify token and connection with a raw getMe API request"""
+        try:
+            response = await cls._aclient.get(f"https://api.telegram.org/bot{token}/getMe")
+            cls._http_ok = response.status_code == 200
+            data = response.json()
+            cls._api_ok = data.get("ok", False)
+            cls._bot_info = data.get("result")
+        except Exception as e:
+            cls._getme_error = e
+    
+    @classmethod
+    def _get_bot(cls):
+        """Create the bot instance on first use"""
+        if cls._bot is None:
+            # python-telegram-bot is imported only when it is needed, not on test collection
+            from telegram import Bot
+            from telegram.request import HTTPXRequest
+            
+            # Connection pool large enough for concurrent requests
+            request = HTTPXRequest(connection_pool_size=32, pool_timeout=10.0, connect_timeout=5.0)
+            cls._bot = Bot(token=os.getenv("TELEGRAM_BOT_TOKEN"), request=request)
+        return cls._bot
+    
     def setUp(self):
         """Set up environment for tests"""
         self.token = os.getenv("TELEGRAM_BOT_TOKEN")
-        self.token_available = bool(self.token)
         
         # Display documentation information
         self.print_documentation_info()
@@ -41,89 +111,86 @@ class TestTelegramAPI(unittest.TestCase):
         print("Telegram Bot API Documentation [@docs:telegram-bot-api]: https://core.telegram.org/bots/api")
         print("================================\n")
     
-    def test_telegram_token_format(self):
-        """Test for Telegram token format"""
-        print("Test: Checking Telegram token format")
-        self.assertTrue(self.token_available, "Telegram token should be available from the .env file")
+    def test_all(self):
+        """Runs all Telegram Bot API checks as subtests of a single test"""
+        with self.subTest("token format"):
+            self._check_token_format()
         
-        # Check token format
-        # Token should consist of two parts, separated by ":"
-        parts = self.token.split(':')
-        self.assertEqual(len(parts), 2, "Token should contain two parts, separated by ':'")
+        with self.subTest("connection"):
+            self._check_api_connection()
         
-        # First part should be a number (bot identifier)
-        self.assertTrue(parts[0].isdigit(), "First part of the token should be a number (bot ID)")
+        with self.subTest("async send"):
+            print("\nRunning asynchronous tests for Telegram Bot API")
+            self._run(self._check_send_message_async())
+            print("Asynchronous tests completed")
+    
+    def _check_token_format(self):
+        """Test for Telegram token format"""
+        print("Test: Checking Telegram token format")
         
-        # Second part should be a string with more than 30 characters
-        self.assertGreater(len(parts[1]), 30, "Second part of the token should be a string with more than 30 characters")
+        # Check token format with a single match
+        match = _TOKEN_RE.match(self.token)
+        self.assertIsNotNone(
+            match,
+            "Token should be a numeric bot ID and a string with more than 30 characters, separated by ':'"
+        )
         
-        print(f"✓ Telegram token format verified: Bot ID {parts[0]}")
+        print(f"✓ Telegram token format verified: Bot ID {match.group(1)}")
     
-    def test_telegram_api_connection(self):
+    def _check_api_connection(self):
         """Test for connection to Telegram API"""
-        if not self.token_available:
-            self.skipTest("Skipping test as token is unavailable")
-        
         print("Test: Verifying connection to Telegram API")
         
-        # Use API request getMe to verify token and connection
-        url = f"https://api.telegram.org/bot{self.token}/getMe"
+        # getMe was requested once in setUpClass
+        if self._getme_error is not None:
+            self.fail(f"Error connecting to Telegram API: {self._getme_error}")
         
-        try:
-            response = requests.get(url)
-            self.assertEqual(response.status_code, 200, "HTTP status should be 200 (OK)")
-            
-            data = response.json()
-            self.assertTrue(data["ok"], "API response should contain 'ok': true")
-            
-            bot_info = data["result"]
-            self.assertIn("username", bot_info, "Bot information should contain username")
-            
-            print(f"✓ Connection to Telegram API successful")
-            print(f"✓ Bot information: {bot_info['first_name']} (@{bot_info['username']})")
-        except Exception as e:
-            self.fail(f"Error connecting to Telegram API: {e}")
+        self.assertTrue(self._http_ok, "HTTP status should be 200 (OK)")
+        self.assertTrue(self._api_ok, "API response should contain 'ok': true")
+        
+        bot_info = self._bot_info
+        self.assertIn("username", bot_info, "Bot information should contain username")
+        
+        print(f"✓ Connection to Telegram API successful")
+        print(f"✓ Bot information: {bot_info['first_name']} (@{bot_info['username']})")
     
-    async def test_telegram_send_message_async(self):
+    async def _check_send_message_async(self):
         """Asynchronous test for sending message via Telegram Bot API"""
-        if not self.token_available:
-            print("Skipping test as token is unavailable")
-            return
-        
-        print("Test: Sending test message using python-telegram-bot")
+        # Collect the output and write it at once instead of flushing every line
+        out = io.StringIO()
+        print("Test: Sending test message using python-telegram-bot", file=out)
         
         try:
-            # Create bot instance
-            bot = Bot(token=self.token)
-            
-            # Get bot information
-            bot_info = await bot.get_me()
-            print(f"✓ Bot: {bot_info.first_name} (@{bot_info.username})")
+            # Bot information was requested in setUpClass; python-telegram-bot
+            # is only used if that request didn't succeed
+            if self._bot_info:
+                print(f"✓ Bot: {self._bot_info['first_name']} (@{self._bot_info['username']})", file=out)
+            else:
+                # Initializing the bot requests getMe; it is shut down in tearDownClass
+                bot = self._get_bot()
+                await bot.initialize()
+                bot_info = bot.bot
+                print(f"✓ Bot: {bot_info.first_name} (@{bot_info.username})", file=out)
             
             # Here we don't send a real message, as we need a chat ID
             # In real tests we could use a predefined chat ID or webhook
-            print("✓ Message sending test passed successfully (simulation)")
-            print("⚠️ Note: sending real messages requires recipient's chat ID")
+            print("✓ Message sending test passed successfully (simulation)", file=out)
+            print("⚠️ Note: sending real messages requires recipient's chat ID", file=out)
             
             # Emulation of /start command
-            print("\n--- Emulating /start command processing ---")
-            print("Hello! I'm a chat bot using models from OpenRouter.")
-            print("Use /models to select a model for conversation.")
-            print("\nI can help you communicate with various language models. I have the following features:")
-            print("• Choose from 10 most popular free models on OpenRouter")
-            print("• Save conversation history for context")
-            print("• Ability to reset conversation history")
-            print("\nTo start, type /models and select a model from the list.")
+            print("\n--- Emulating /start command processing ---", file=out)
+            print("Hello! I'm a chat bot using models from OpenRouter.", file=out)
+            print("Use /models to select a model for conversation.", file=out)
+            print("\nI can help you communicate with various language models. I have the following features:", file=out)
+            print("• Choose from 10 most popular free models on OpenRouter", file=out)
+            print("• Save conversation history for context", file=out)
+            print("• Ability to reset conversation history", file=out)
+            print("\nTo start, type /models and select a model from the list.", file=out)
             
         except Exception as e:
-            print(f"❌ Error working with Telegram Bot API: {e}")
-            return
-    
-    def test_run_async_tests(self):
-        """Runs asynchronous tests"""
-        print("\nRunning asynchronous tests for Telegram Bot API")
-        asyncio.run(self.test_telegram_send_message_async())
-        print("Asynchronous tests completed")
+            print(f"❌ Error working with Telegram Bot API: {e}", file=out)
+        finally:
+            sys.stdout.write(out.getvalue())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import asyncio
+from collections import deque
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# Import bot handlers
+from src.bot import telegram_bot
+from src.bot.session_store import LRUSessionStore
+
+USER_ID = 1
+MODEL_ID = "meta-llama/llama-4-scout:free"
+
+class _FakeClient:
+    """OpenRouter client streaming a fixed response once it is released, then failing if an error is set"""
+    
+    def __init__(self, parts):
+        self.parts = parts
+        self.error = None
+        self.history = None
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+    
+    async def stream_response(self, model_id, message, history):
+        self.history = list(history)
+        self.started.set()
+        await self.release.wait()
+        for part in self.parts:
+            yield part
+        if self.error is not None:
+            raise self.error
+
+class _FakeSessionStore:
+    """Session store without any stored sessions"""
+    
+    async def load(self, user_id):
+        return None
+
+class _BlockingSessionStore(_FakeSessionStore):
+    """Session store whose writes wait until they are released"""
+    
+    def __init__(self, error=None):
+        self.error = error
+        self.saved = []
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+    
+    async def save_many(self, sessions):
+        rows = list(sessions)
+        self.started.set()
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        self.saved.extend(rows)
+
+# Use IsolatedAsyncioTestCase for asynchronous tests
+class TestFlushSessions(unittest.IsolatedAsyncioTestCase):
+    """Tests for writing changed sessions to the session store"""
+    
+    def setUp(self):
+        """Replace the bot state with one changed session"""
+        self.session = {"chat_history": deque(), "history_chars": 0, "selected_model": MODEL_ID}
+        self.user_sessions = LRUSessionStore(10)
+        self.dirty_sessions = {USER_ID: self.session}
+        for name, value in (
+            ("user_sessions", self.user_sessions),
+            ("dirty_sessions", self.dirty_sessions),
+            ("saving_sessions", {})
+        ):
+            patcher = patch.object(telegram_bot, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def _use_store(self, store):
+        """Write sessions to the given store"""
+        patcher = patch.object(telegram_bot, "session_store", store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return store
+    
+    async def test_session_visible_while_saving(self):
+        """Test for finding an evicted session while it is being written"""
+        store = self._use_store(_BlockingSessionStore())
+        
+        task = asyncio.create_task(telegram_bot.flush_sessions())
+        await store.started.wait()
+        self.assertIs(await telegram_bot._get_user_session(USER_ID), self.session, "Session being saved should be returned")
+        store.release.set()
+        await task
+        
+        self.assertEqual(store.saved, [(USER_ID, MODEL_ID, [])], "Session should be saved")
+        self.assertEqual(self.dirty_sessions, {}, "Saved session should no longer be dirty")
+    
+    async def test_session_changed_while_saving(self):
+        """Test for keeping a session changed during the write for the next flush"""
+        store = self._use_store(_BlockingSessionStore())
+        
+        task = asyncio.create_task(telegram_bot.flush_sessions())
+        await store.started.wait()
+        telegram_bot._save_user_session(USER_ID, self.session)
+        store.release.set()
+        await task
+        
+        self.assertIs(self.dirty_sessions.get(USER_ID), self.session, "Changed session should stay dirty")
+    
+    async def test_failed_save_is_retried(self):
+        """Test for keeping sessions dirty when the write fails"""
+        store = self._use_store(_BlockingSessionStore(error=Exception("database is locked")))
+        store.release.set()
+        
+        await telegram_bot.flush_sessions()
+        
+        self.assertIs(self.dirty_sessions.get(USER_ID), self.session, "Session should be saved with the next flush")
+
+class TestAnswerMessage(unittest.IsolatedAsyncioTestCase):
+    """Tests for answering a message while the chat is reset"""
+    
+    def setUp(self):
+        """Replace the bot state with an in-memory session of one user"""
+        self.session = {
+            "chat_history": deque([
+                {"role": "user", "content": "Hello"},
+                {"role": "assistant", "content": "Hi!"}
+            ]),
+            "history_chars": 8,
+            "selected_model": MODEL_ID
+        }
+        self.user_sessions = LRUSessionStore(10)
+        self.user_sessions[USER_ID] = self.session
+        self.dirty_sessions = {}
+        for name, value in (
+            ("user_sessions", self.user_sessions),
+            ("dirty_sessions", self.dirty_sessions),
+            ("session_store", _FakeSessionStore()),
+            ("STREAM_EDIT_INTERVAL", 0)
+        ):
+            patcher = patch.object(telegram_bot, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def _use_client(self, parts):
+        """Stream the given parts as the model response"""
+        client = _FakeClient(parts)
+        patcher = patch.object(telegram_bot, "openrouter_client", client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return client
+    
+    def _make_update(self, text):
+        """Create an update with a message whose placeholder reply is sent once released"""
+        update = MagicMock()
+        update.effective_user.id = USER_ID
+        update.effective_chat.id = USER_ID
+        update.message.text = text
+        
+        self.reply = MagicMock()
+        self.reply.edit_text = AsyncMock()
+        self.placeholder_requested = asyncio.Event()
+        self.placeholder_release = asyncio.Event()
+        self.placeholder_release.set()
+        
+        async def reply_text(text):
+            if text == '…':
+                self.placeholder_requested.set()
+                await self.placeholder_release.wait()
+                return self.reply
+            return MagicMock()
+        
+        update.message.reply_text = AsyncMock(side_effect=reply_text)
+        return update
+    
+    def _make_context(self):
+        """Create a handler context with a bot"""
+        context = MagicMock()
+        context.bot.send_chat_action = AsyncMock()
+        return context
+    
+    async def _reset(self):
+        """Run the /reset command of the user"""
+        await telegram_bot.reset_chat(self._make_reset_update(), self._make_context())
+    
+    def _make_reset_update(self):
+        """Create an update with the /reset command"""
+        update = MagicMock()
+        update.effective_user.id = USER_ID
+        update.message.reply_text = AsyncMock()
+        return update
+    
+    def _assert_history_consistent(self):
+        """Check that the history length counter matches the history"""
+        expected = sum(len(message["content"]) for message in self.session["chat_history"])
+        self.assertEqual(self.session["history_chars"], expected, "History length should match the history")
+    
+    async def test_answer_message(self):
+        """Test for answering a message with the previous history as context"""
+        client = self._use_client(["Fine, ", "thanks"])
+        client.release.set()
+        
+        await telegram_bot._answer_message(self._make_update("How are you?"), self._make_context())
+        
+        self.assertEqual([m["content"] for m in client.history], ["Hello", "Hi!"], "Only the previous history should be sent")
+        self.assertEqual(
+            [m["content"] for m in self.session["chat_history"]],
+            ["Hello", "Hi!", "How are you?", "Fine, thanks"],
+            "Message and response should be added to history"
+        )
+        self.reply.edit_text.assert_awaited_with("Fine, thanks")
+        self.assertIs(self.dirty_sessions.get(USER_ID), self.session, "Session should be marked for saving")
+        self._assert_history_consistent()
+    
+    async def test_reset_while_sending_placeholder(self):
+        """Test for resetting the chat before the placeholder reply is sent"""
+        client = self._use_client(["Fine"])
+        client.release.set()
+        update = self._make_update("How are you?")
+        self.placeholder_release.clear()
+        
+        task = asyncio.create_task(telegram_bot._answer_message(update, self._make_context()))
+        await self.placeholder_requested.wait()
+        await self._reset()
+        self.placeholder_release.set()
+        await task
+        
+        self.assertEqual(len(client.history), 2, "History before the message should be sent")
+        self.reply.edit_text.assert_awaited_with("Fine")
+        self._assert_history_consistent()
+    
+    async def test_reset_during_stream_with_empty_response(self):
+        """Test for resetting the chat while the model returns an empty response"""
+        client = self._use_client([" "])
+        
+        task = asyncio.create_task(telegram_bot._answer_message(self._make_update("How are you?"), self._make_context()))
+        await client.started.wait()
+        await self._reset()
+        client.release.set()
+        await task
+        
+        self.assertEqual(len(self.session["chat_history"]), 0, "Reset history should stay empty")
+        self.reply.edit_text.assert_awaited_once()
+        self._assert_history_consistent()
+    
+    async def test_empty_response_is_rolled_back(self):
+        """Test for removing an unanswered message from history"""
+        client = self._use_client([""])
+        client.release.set()
+        
+        await telegram_bot._answer_message(self._make_update("How are you?"), self._make_context())
+        
+        self.assertEqual([m["content"] for m in self.session["chat_history"]], ["Hello", "Hi!"], "Unanswered message should be removed")
+        self.assertIs(self.dirty_sessions.get(USER_ID), self.session, "Session should be marked for saving")
+        self._assert_history_consistent()
+    
+    async def test_stream_error(self):
+        """Test for replacing the placeholder with an error when the stream fails"""
+        client = self._use_client([])
+        client.release.set()
+        client.error = Exception("Error generating response: 503")
+        
+        await telegram_bot._answer_message(self._make_update("How are you?"), self._make_context())
+        
+        self.reply.edit_text.assert_awaited_once_with('Sorry, something went wrong — please try again.')
+        self.assertEqual([m["content"] for m in self.session["chat_history"]], ["Hello", "Hi!"], "Unanswered message should be removed")
+        self.assertIs(self.dirty_sessions.get(USER_ID), self.session, "Session should be marked for saving")
+        self._assert_history_consistent()
+    
+    async def test_reset_then_cancel(self):
+        """Test for cancelling the answer after the chat was reset"""
+        client = self._use_client(["Fine"])
+        
+        task = asyncio.create_task(telegram_bot._answer_message(self._make_update("How are you?"), self._make_context()))
+        await client.started.wait()
+        await self._reset()
+        task.cancel()
+        
+        with self.assertRaises(asyncio.CancelledError, msg="Cancellation should propagate"):
+            await task
+        self.assertEqual(len(self.session["chat_history"]), 0, "Reset history should stay empty")
+        self.reply.edit_text.assert_awaited_once()
+        self.assertIs(self.dirty_sessions.get(USER_ID), self.session, "Session should be marked for saving")
+        self._assert_history_consistent()
+
+class TestModelsPage(unittest.TestCase):
+    """Tests for the cached pages of the models list"""
+    
+    def setUp(self):
+        """Start without cached pages"""
+        for name, value in (("_models_generation", -1), ("_models", ())):
+            patcher = patch.object(telegram_bot, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        telegram_bot._build_models_page.cache_clear()
+        self.addCleanup(telegram_bot._build_models_page.cache_clear)
+    
+    @staticmethod
+    def _make_models(count, prefix="model"):
+        """Create a free models list"""
+        return tuple(
+            {"id": f"{prefix}-{i}:free", "name": f"{prefix} {i}", "is_free": True}
+            for i in range(count)
+        )
+    
+    def test_page_is_cached_per_generation(self):
+        """Test for building a page once until the catalog generation changes"""
+        models = self._make_models(12)
+        text, markup = telegram_bot._get_models_page(models, 1, 2)
+        self.assertIn("Page 3/3", text, "Last page should be shown")
+        self.assertEqual(len(markup.inline_keyboard), 3, "Last page should hold two models and navigation")
+        self.assertIs(telegram_bot._get_models_page(models, 1, 2)[1], markup, "Page should be served from the cache")
+        
+        # A reloaded catalog replaces the cached pages
+        text, markup = telegram_bot._get_models_page(self._make_models(3, "other"), 2, 0)
+        self.assertIn("3 total", text, "Page should be built from the new list")
+        self.assertEqual(markup.inline_keyboard[0][0].callback_data, "model:other-0:free", "New models should be shown")
+
+if __name__ == "__main__":
+    unittest.main()